@@ -1,14 +1,55 @@
 """
 Tic Tac Toe Player
 """
-import copy
 import math
 
+from tictactoe_constants import EXACT, FULL, LOWER, MOVE_ORDER, UPPER, WINS
+
+try:
+    import tictactoe_fast
+except ImportError:
+    # Numba is optional, fall back to the pure Python search
+    tictactoe_fast = None
+
 X = "X"
 O = "O"
 EMPTY = None
 
 
+def symmetries():
+    """
+    Returns the 8 rotations and reflections of the board,
+    each as a tuple mapping every cell bit to its new bit
+    """
+    rotate = [3 * j + 2 - i for i in range(3) for j in range(3)]
+    reflect = [3 * i + 2 - j for i in range(3) for j in range(3)]
+    perms = []
+    perm = list(range(9))
+    for _ in range(4):
+        perms.append(tuple(perm))
+        perms.append(tuple(reflect[idx] for idx in perm))
+        perm = [rotate[idx] for idx in perm]
+    return perms
+
+
+def permute_mask(mask, perm):
+    """
+    Returns mask with every cell bit moved according to perm
+    """
+    return sum(1 << perm[idx] for idx in range(9) if mask >> idx & 1)
+
+
+# Board symmetries, their inverses, and every 9-bit mask under each symmetry
+SYMMETRIES = symmetries()
+INVERSES = [tuple(perm.index(idx) for idx in range(9)) for perm in SYMMETRIES]
+SYMMETRY_MASKS = [tuple(permute_mask(mask, perm) for mask in range(FULL + 1))
+                  for perm in SYMMETRIES]
+
+# Transposition table shared across minimax calls, maps the canonical
+# key of a board among its symmetries to (utility, flag, canonical action)
+TT = {}
+
+
 class InvalidMoveError(Exception):
     pass
 
@@ -22,38 +63,63 @@ def initial_state():
             [EMPTY, EMPTY, EMPTY]]
 
 
+def count_bits(mask):
+    """
+    Returns the number of set bits in mask
+    """
+    return bin(mask).count("1")
+
+
+def mask_player(x_mask, o_mask):
+    """
+    Returns player who has the next turn on a board given as masks.
+    """
+    return O if count_bits(x_mask | o_mask) & 1 else X
+
+
+def mask_actions(x_mask, o_mask):
+    """
+    Yields the bit of every empty cell on a board given as masks.
+    """
+    empties = ~(x_mask | o_mask) & FULL
+    while empties:
+        low = empties & -empties
+        yield low.bit_length() - 1
+        empties ^= low
+
+
+def ordered_actions(x_mask, o_mask, first=None):
+    """
+    Yields the bit of every empty cell, starting with first if given,
+    then in MOVE_ORDER
+    """
+    occupied = x_mask | o_mask
+    if first is not None:
+        yield first
+    for action in MOVE_ORDER:
+        if action != first and not occupied >> action & 1:
+            yield action
+
+
 def player(board):
     """
     Returns player who has the next turn on a board.
     """
-    empty_count = 0
-    for row in board:
-        for col in row:
-            if col == EMPTY:
-                empty_count += 1
-    if empty_count % 2 == 0:
-        return O
-    else:
-        return X
+    return mask_player(*get_masks(board))
 
 
 def actions(board):
     """
     Returns set of all possible actions (i, j) available on the board.
     """
-    action_set = []
-    for i in range(len(board)):
-        for j in range(len(board[0])):
-            if board[i][j] == EMPTY:
-                action_set.append((i, j))
-    return action_set
+    return [divmod(idx, 3) for idx in mask_actions(*get_masks(board))]
 
 
 def result(board, action):
     """
     Returns the board that results from making move (i, j) on the board.
     """
-    new_board = copy.deepcopy(board)
+    new_board = [row[:] for row in board]
     if board[action[0]][action[1]] == EMPTY:
         new_board[action[0]][action[1]] = player(board)
         return new_board
@@ -61,41 +127,52 @@ def result(board, action):
         raise InvalidMoveError
 
 
-def check_row(board):
-    for row in board:
-        symbol = row[0]
-        for col in row:
-            if col != symbol:
-                break
-        else:
-            return symbol
+def get_masks(board):
+    """
+    Returns the cells taken by X and by O as a pair of 9-bit masks,
+    where cell (i, j) is bit 3 * i + j
+    """
+    x_mask = o_mask = 0
+    for i, row in enumerate(board):
+        for j, col in enumerate(row):
+            if col == X:
+                x_mask |= 1 << (3 * i + j)
+            elif col == O:
+                o_mask |= 1 << (3 * i + j)
+    return x_mask, o_mask
 
 
-def check_diag(board):
-    diag_1 = [r[i] for i, r in enumerate(board)]
-    diag_2 = [r[-i-1] for i, r in enumerate(board)]
-    return check_row([diag_1, diag_2])
+def has_line(mask):
+    """
+    Returns True if mask covers any of the winning lines
+    """
+    return any(mask & line == line for line in WINS)
+
+
+def mask_winner(x_mask, o_mask):
+    """
+    Returns the winner of the game given as masks, if there is one.
+    """
+    if has_line(x_mask):
+        return X
+    if has_line(o_mask):
+        return O
+    return None
 
 
 def winner(board):
     """
     Returns the winner of the game, if there is one.
     """
-    return check_row(board) or check_row(zip(*board)) or check_diag(board) or None
+    return mask_winner(*get_masks(board))
 
 
 def terminal(board):
     """
     Returns True if game is over, False otherwise.
     """
-    if winner(board):
-        return True
-
-    for row in board:
-        for col in row:
-            if col == EMPTY:
-                return False
-    return True
+    x_mask, o_mask = get_masks(board)
+    return mask_winner(x_mask, o_mask) is not None or (x_mask | o_mask) == FULL
 
 
 def utility(board):
@@ -111,41 +188,109 @@ def utility(board):
         return 0
 
 
-def get_max(board, cur_max):
+def canonical_key(x_mask, o_mask):
     """
-    Returns the max utility and action as a set for current board
+    Returns the smallest key of the board among its 8 symmetries,
+    and the index of the symmetry producing it
     """
-    score = -math.inf, ()
-    for action in actions(board):
-        new_board = result(board, action)
-        if terminal(new_board):
-            return utility(new_board), action
+    return min((table[x_mask] << 9 | table[o_mask], sym)
+               for sym, table in enumerate(SYMMETRY_MASKS))
+
+
+def tt_probe(x_mask, o_mask, cur_bound, maximizing):
+    """
+    Returns the stored utility and action for the board from the transposition
+    table, and whether they decide the search against the parent's bound.
+    Returns None if the board is not stored
+    """
+    key, sym = canonical_key(x_mask, o_mask)
+    entry = TT.get(key)
+    if entry is None:
+        return None
+    value, flag, action = entry
+    # A bound that already crosses the parent's bound causes the same cut-off
+    decided = (flag == EXACT
+               or maximizing and flag == LOWER and value > cur_bound[0]
+               or not maximizing and flag == UPPER and value < cur_bound[0])
+    return (value, INVERSES[sym][action]), decided
+
+
+def tt_store(x_mask, o_mask, score, flag):
+    """
+    Stores the utility and action of a searched board in the transposition table
+    """
+    if score[1] is None:
+        # boards without any action are never searched
+        return
+    key, sym = canonical_key(x_mask, o_mask)
+    TT[key] = score[0], flag, SYMMETRIES[sym][score[1]]
+
+
+def get_max(x_mask, o_mask, cur_max):
+    """
+    Returns the max utility and action bit as a set for current board
+    """
+    cached = tt_probe(x_mask, o_mask, cur_max, True)
+    first = None
+    if cached is not None:
+        cached_score, decided = cached
+        if decided:
+            return cached_score
+        # try the best action of the earlier search first
+        first = cached_score[1]
+
+    score = -math.inf, None
+    for action in ordered_actions(x_mask, o_mask, first):
+        new_x_mask = x_mask | 1 << action
+        if has_line(new_x_mask):
+            score = 1, action
+            break
+        elif (new_x_mask | o_mask) == FULL:
+            score = 0, action
+            break
         else:
-            cur = get_min(new_board, score)
-            if cur > score:
+            cur = get_min(new_x_mask, o_mask, score)
+            if cur[0] > score[0]:
                 score = cur[0], action
             # AB-Pruning
             if cur[0] > cur_max[0]:
+                tt_store(x_mask, o_mask, score, LOWER)
                 return score
+    tt_store(x_mask, o_mask, score, EXACT)
     return score
 
 
-def get_min(board, cur_min):
+def get_min(x_mask, o_mask, cur_min):
     """
-    Returns the min utility and action as a set for current board
+    Returns the min utility and action bit as a set for current board
     """
-    score = math.inf, ()
-    for action in actions(board):
-        new_board = result(board, action)
-        if terminal(new_board):
-            return utility(new_board), action
+    cached = tt_probe(x_mask, o_mask, cur_min, False)
+    first = None
+    if cached is not None:
+        cached_score, decided = cached
+        if decided:
+            return cached_score
+        # try the best action of the earlier search first
+        first = cached_score[1]
+
+    score = math.inf, None
+    for action in ordered_actions(x_mask, o_mask, first):
+        new_o_mask = o_mask | 1 << action
+        if has_line(new_o_mask):
+            score = -1, action
+            break
+        elif (x_mask | new_o_mask) == FULL:
+            score = 0, action
+            break
         else:
-            cur = get_max(new_board, score)
-            if cur < score:
+            cur = get_max(x_mask, new_o_mask, score)
+            if cur[0] < score[0]:
                 score = cur[0], action
             # AB-Pruning
             if cur[0] < cur_min[0]:
+                tt_store(x_mask, o_mask, score, UPPER)
                 return score
+    tt_store(x_mask, o_mask, score, EXACT)
     return score
 
 
@@ -153,8 +298,15 @@ def minimax(board):
     """
     Returns the optimal action for the current player on the board.
     """
-    if player(board) == X:
-        optimal_action = get_max(board, (math.inf, ()))
+    if terminal(board):
+        return None
+
+    x_mask, o_mask = get_masks(board)
+    if tictactoe_fast is not None:
+        _, move = tictactoe_fast.best_move(x_mask, o_mask, tictactoe_fast.TT)
+        return divmod(move, 3)
+    if mask_player(x_mask, o_mask) == X:
+        optimal_action = get_max(x_mask, o_mask, (math.inf, None))
     else:
-        optimal_action = get_min(board, (-math.inf, ()))
-    return optimal_action[1]
+        optimal_action = get_min(x_mask, o_mask, (-math.inf, None))
+    return divmod(optimal_action[1], 3)
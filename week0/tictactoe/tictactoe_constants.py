@@ -0,0 +1,19 @@
+"""
+Bitboard constants shared by the Tic Tac Toe searches
+Cell (i, j) is bit 3 * i + j
+"""
+
+# Masks of the 8 winning lines: rows, columns and diagonals
+WINS = (0b000000111, 0b000111000, 0b111000000,
+        0b001001001, 0b010010010, 0b100100100,
+        0b100010001, 0b001010100)
+FULL = 0b111111111
+
+# Search order of cell bits: center, corners, then edges
+MOVE_ORDER = (4, 0, 2, 6, 8, 1, 3, 5, 7)
+
+# Transposition table flags: the stored utility is exact,
+# or only a lower/upper bound because of an AB-Pruning cut-off
+EXACT = 0
+LOWER = 1
+UPPER = 2
@@ -0,0 +1,121 @@
+"""
+Tic Tac Toe search compiled with Numba
+Works on bitboards where cell (i, j) is bit 3 * i + j
+"""
+from numba import njit, types
+from numba.typed import Dict
+
+from tictactoe_constants import EXACT, FULL, LOWER, MOVE_ORDER, UPPER, WINS
+
+# Transposition table shared across calls, maps (mover << 9 | opponent)
+# to (utility + 1) | flag << 2 | best move << 4
+TT = Dict.empty(key_type=types.int64, value_type=types.int64)
+
+
+@njit(cache=True)
+def has_line(mask):
+    """
+    Returns True if mask covers any of the winning lines
+    """
+    for line in WINS:
+        if mask & line == line:
+            return True
+    return False
+
+
+@njit(cache=True)
+def count_bits(mask):
+    """
+    Returns the number of set bits in mask
+    """
+    count = 0
+    while mask:
+        mask &= mask - 1
+        count += 1
+    return count
+
+
+@njit
+def negamax(mover, opponent, alpha, beta, tt):
+    """
+    Returns the utility of the board for the player about to move,
+    given the cells taken by that player and by the opponent
+    """
+    alpha_orig = alpha
+    key = mover << 9 | opponent
+    first = -1
+    entry = tt.get(key, -1)
+    if entry >= 0:
+        value = (entry & 3) - 1
+        flag = entry >> 2 & 3
+        first = entry >> 4
+        if flag == EXACT:
+            return value
+        elif flag == LOWER:
+            alpha = max(alpha, value)
+        else:
+            beta = min(beta, value)
+        if alpha >= beta:
+            return value
+
+    # Only the player who just moved can have completed a line
+    if has_line(opponent):
+        return -1
+    occupied = mover | opponent
+    if occupied == FULL:
+        return 0
+
+    best, move = -2, -1
+    # try the best move of the earlier search first, then MOVE_ORDER
+    for n in range(-1, 9):
+        if n < 0:
+            idx = first
+        else:
+            idx = MOVE_ORDER[n]
+            if idx == first:
+                continue
+        if idx < 0:
+            continue
+        bit = 1 << idx
+        if occupied & bit:
+            continue
+        value = -negamax(opponent, mover | bit, -beta, -alpha, tt)
+        if value > best:
+            best, move = value, idx
+        if best > alpha:
+            alpha = best
+        # AB-Pruning
+        if alpha >= beta:
+            break
+
+    if best <= alpha_orig:
+        flag = UPPER
+    elif best >= beta:
+        flag = LOWER
+    else:
+        flag = EXACT
+    tt[key] = (best + 1) | flag << 2 | move << 4
+    return best
+
+
+@njit
+def best_move(x_mask, o_mask, tt):
+    """
+    Returns the utility for X and the bit of the optimal move
+    for the player who has the next turn
+    """
+    if count_bits(x_mask | o_mask) & 1:
+        mover, opponent, sign = o_mask, x_mask, -1
+    else:
+        mover, opponent, sign = x_mask, o_mask, 1
+
+    best, move = -2, -1
+    occupied = mover | opponent
+    for idx in MOVE_ORDER:
+        bit = 1 << idx
+        if occupied & bit:
+            continue
+        value = -negamax(opponent, mover | bit, -2, -best, tt)
+        if value > best:
+            best, move = value, idx
+    return sign * best, move
@@ -1,11 +1,32 @@
 import itertools
 import random
+from collections import deque
+from functools import lru_cache
 
 
 class KnowledgeCountError(Exception):
     pass
 
 
+@lru_cache(maxsize=None)
+def neighbor_counts(height, width):
+    """
+    Returns, for each cell of a board, the nearby mine counts it adds
+    to the cells around it when it is a mine, packed in one int
+    with 4 bits per cell, where cell (i, j) is index i * width + j
+    """
+    return tuple(
+        sum(
+            1 << 4 * (r * width + c)
+            for r in range(max(i - 1, 0), min(i + 2, height))
+            for c in range(max(j - 1, 0), min(j + 2, width))
+            if (r, c) != (i, j)
+        )
+        for i in range(height)
+        for j in range(width)
+    )
+
+
 class Minesweeper:
     """
     Minesweeper game representation
@@ -19,20 +40,25 @@ class Minesweeper:
         self.mines = set()
 
         # Initialize an empty field with no mines
-        self.board = []
-        for i in range(self.height):
-            row = []
-            for j in range(self.width):
-                row.append(False)
-            self.board.append(row)
-
-        # Add mines randomly
-        while len(self.mines) != mines:
-            i = random.randrange(height)
-            j = random.randrange(width)
-            if not self.board[i][j]:
-                self.mines.add((i, j))
-                self.board[i][j] = True
+        self.board = [[False] * self.width for _ in range(self.height)]
+
+        # Mines as a bitmask, where cell (i, j) is bit i * width + j,
+        # and nearby mine counts of every cell packed 4 bits per cell,
+        # added up from the mines only
+        mine_bits = 0
+        nearby = 0
+        counts = neighbor_counts(height, width)
+
+        # Add mines randomly, drawing distinct cells in one go
+        for idx in random.sample(range(height * width), mines):
+            i, j = divmod(idx, width)
+            self.mines.add((i, j))
+            self.board[i][j] = True
+            mine_bits |= 1 << idx
+            nearby += counts[idx]
+
+        self.mine_bits = mine_bits
+        self.nearby = nearby
 
         # At first, player has found no mines
         self.mines_found = set()
@@ -42,19 +68,14 @@ class Minesweeper:
         Prints a text-based representation
         of where mines are located.
         """
-        for i in range(self.height):
+        for row in self.board:
             print("--" * self.width + "-")
-            for j in range(self.width):
-                if self.board[i][j]:
-                    print("|X", end="")
-                else:
-                    print("| ", end="")
-            print("|")
+            print("|" + "|".join("X" if cell else " " for cell in row) + "|")
         print("--" * self.width + "-")
 
     def is_mine(self, cell):
         i, j = cell
-        return self.board[i][j]
+        return bool(self.mine_bits >> (i * self.width + j) & 1)
 
     def nearby_mines(self, cell):
         """
@@ -63,23 +84,8 @@ class Minesweeper:
         not including the cell itself.
         """
 
-        # Keep count of nearby mines
-        count = 0
-
-        # Loop over all cells within one row and column
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
-
-                # Ignore the cell itself
-                if (i, j) == cell:
-                    continue
-
-                # Update count if cell in bounds and is mine
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    if self.board[i][j]:
-                        count += 1
-
-        return count
+        i, j = cell
+        return self.nearby >> 4 * (i * self.width + j) & 0b1111
 
     def won(self):
         """
@@ -88,59 +94,85 @@ class Minesweeper:
         return self.mines_found == self.mines
 
 
+def count_bits(mask):
+    """
+    Returns the number of set bits in mask
+    """
+    return bin(mask).count("1")
+
+
+def iter_bits(mask):
+    """
+    Yields every set bit of mask as a single-bit mask
+    """
+    while mask:
+        bit = mask & -mask
+        yield bit
+        mask ^= bit
+
+
 class Sentence:
     """
     Logical statement about a Minesweeper game
-    A sentence consists of a set of board cells,
+    A sentence consists of a set of board cells, stored as a bitmask,
     and a count of the number of those cells which are mines.
     A sentence only contains unknown cells,
     i.e. known safes and mines are not included
     """
 
     def __init__(self, cells, count):
-        self.cells = set(cells)
+        self.cells = cells
         self.count = count
+        # number of cells, kept up to date instead of recounting the mask
+        self.size = count_bits(cells)
 
     def __eq__(self, other):
         return self.cells == other.cells and self.count == other.count
 
+    def __hash__(self):
+        # consistent with __eq__, so a sentence must not be marked
+        # while it is held in a set or used as a dict key
+        return hash((self.cells, self.count))
+
     def __str__(self):
-        return f"{self.cells} = {self.count}"
+        return f"{bin(self.cells)} = {self.count}"
 
     def known_mines(self):
         """
-        Returns the set of all cells in self.cells known to be mines.
+        Returns the mask of all cells in self.cells known to be mines.
         """
-        if len(self.cells) == self.count:
-            return set(self.cells)
+        if self.size == self.count:
+            return self.cells
         else:
-            return set()
+            return 0
 
     def known_safes(self):
         """
-        Returns the set of all cells in self.cells known to be safe.
+        Returns the mask of all cells in self.cells known to be safe.
         """
         if self.count == 0:
-            return set(self.cells)
+            return self.cells
         else:
-            return set()
+            return 0
 
-    def mark_mine(self, cell):
+    def mark_mine(self, bit):
         """
         Updates internal knowledge representation given the fact that
-        a cell is known to be a mine.
+        the cell of bit is known to be a mine.
         """
-        if cell in self.cells:
-            self.cells.remove(cell)
+        if self.cells & bit:
+            self.cells ^= bit
+            self.size -= 1
             self.count -= 1
 
-    def mark_safe(self, cell):
+    def mark_safe(self, bit):
         """
         Updates internal knowledge representation given the fact that
-        a cell is known to be safe.
+        the cell of bit is known to be safe.
         """
-        if cell in self.cells:
-            self.cells.remove(cell)
+        if self.cells & bit:
+            self.cells ^= bit
+            self.size -= 1
 
 
 class MinesweeperAI:
@@ -160,8 +192,36 @@ class MinesweeperAI:
         self.mines = set()
         self.safes = set()
 
-        # List of sentences about the game known to be true
-        self.knowledge = []
+        # Same cells as bitmasks, where cell (r, c) is bit r * width + c
+        self.mine_bits = 0
+        self.safe_bits = 0
+
+        # Keep track of cells still available for safe and random moves
+        self.available_safes = set()
+        self.available_unknown = {
+            (r, c) for r in range(height) for c in range(width)
+        }
+
+        # Sentences about the game known to be true, keyed by their cells
+        self.knowledge = {}
+
+        # Keys of the knowledge sentences containing each cell bit
+        self.cell_index = {}
+
+        # Keys of the knowledge sentences added or changed but not yet checked
+        self.pending = deque()
+
+        # Mask of cells around each cell of the board, not including the cell itself
+        self.all_neighbors = {
+            (r, c): sum(
+                self.cell_bit((r + i, c + j))
+                for i in range(-1, 2)
+                for j in range(-1, 2)
+                if (i or j) and self.in_range(r + i, c + j)
+            )
+            for r in range(height)
+            for c in range(width)
+        }
 
     def in_range(self, r, c):
         """
@@ -169,129 +229,170 @@ class MinesweeperAI:
         """
         return 0 <= r < self.height and 0 <= c < self.width
 
+    def cell_bit(self, cell):
+        """
+        returns the bit of a given cell
+        """
+        return 1 << (cell[0] * self.width + cell[1])
+
+    def bit_cell(self, bit):
+        """
+        returns the cell of a given bit
+        """
+        return divmod(bit.bit_length() - 1, self.width)
+
     def neighbors(self, r, c):
         """
-        returns all neighbors of a given cell as a set
+        returns all neighbors of a given cell as a mask
         """
-        neigh = set()
-        for i in range(-1, 2):
-            for j in range(-1, 2):
-                row = r+i
-                col = c+j
-                if self.in_range(row, col) and (row, col) not in self.moves_made:
-                    neigh.add((row, col))
-        return neigh
+        return self.all_neighbors[(r, c)]
 
     def reduce_set(self, sentence1, sentence2):
         """
         reduces sentence2 by sentence1,
         where sentence2 is a subset of sentence1
         """
-        sentence2.cells = sentence2.cells - sentence1.cells
-        sentence2.count = sentence2.count - sentence1.count
+        sentence2.cells &= ~sentence1.cells
+        sentence2.size -= sentence1.size
+        sentence2.count -= sentence1.count
 
     def find_set_diff(self, sentence1, sentence2):
         """
         checks if two knowledge sentences are subsets of the other
         and reduce the cells and count
         """
-        if sentence1.cells < sentence2.cells:
-            self.reduce_set(sentence1, sentence2)
-            return True
-        elif sentence2.cells < sentence1.cells:
-            self.reduce_set(sentence2, sentence1)
-            return True
+        # only the smaller sentence can be a proper subset of the other,
+        # and sentences of equal size are never proper subsets
+        if sentence1.size < sentence2.size:
+            if sentence1.cells & sentence2.cells == sentence1.cells:
+                self.reduce_set(sentence1, sentence2)
+                return True
+        elif sentence2.size < sentence1.size:
+            if sentence1.cells & sentence2.cells == sentence2.cells:
+                self.reduce_set(sentence2, sentence1)
+                return True
         return False
 
+    def add_sentence(self, sentence):
+        """
+        Adds sentence to knowledge unless a sentence
+        with the same cells is already known
+        """
+        key = sentence.cells
+        known = self.knowledge.get(key)
+        if known is None:
+            self.knowledge[key] = sentence
+            self.pending.append(key)
+            for bit in iter_bits(key):
+                self.cell_index.setdefault(bit, set()).add(key)
+        elif known.count != sentence.count:
+            raise KnowledgeCountError
+
+    def remove_sentence(self, key):
+        """
+        Removes and returns the sentence stored under key
+        """
+        for bit in iter_bits(key):
+            keys = self.cell_index.get(bit)
+            if keys is not None:
+                keys.discard(key)
+        return self.knowledge.pop(key)
+
+    def rekey_sentence(self, key, sentence):
+        """
+        Moves sentence stored under key to the key of its current cells
+        """
+        if key != sentence.cells:
+            self.remove_sentence(key)
+            self.add_sentence(sentence)
+
     def mark_mine(self, cell):
         """
         Marks a cell as a mine, and updates all knowledge
         to mark that cell as a mine as well.
         """
+        bit = self.cell_bit(cell)
         self.mines.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_mine(cell)
+        self.mine_bits |= bit
+        self.available_unknown.discard(cell)
+        for key in self.cell_index.pop(bit, ()):
+            sentence = self.knowledge[key]
+            sentence.mark_mine(bit)
+            self.rekey_sentence(key, sentence)
 
     def mark_safe(self, cell):
         """
         Marks a cell as safe, and updates all knowledge
         to mark that cell as safe as well.
         """
+        bit = self.cell_bit(cell)
         self.safes.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_safe(cell)
+        self.safe_bits |= bit
+        if cell not in self.moves_made:
+            self.available_safes.add(cell)
+        for key in self.cell_index.pop(bit, ()):
+            sentence = self.knowledge[key]
+            sentence.mark_safe(bit)
+            self.rekey_sentence(key, sentence)
 
     def remove_known_cells(self, sentence):
         """
-        Marks known safe and mines in sentences
-        Returns True if update is made and False otherwise
-        """
-        for cell in set(sentence.cells):
-            if cell in self.mines:
-                sentence.mark_mine(cell)
-            elif cell in self.safes:
-                sentence.mark_safe(cell)
-
-    def add_known_cells(self, sentence):
-        """
-        Adds any new known safes or mines from sentence
-        and updates all other sentences if found
-        Returns True if update is made and False otherwise
+        Marks known safe and mines in sentence
         """
-        new_safes = sentence.known_safes()
-        new_mines = sentence.known_mines()
-        if new_safes:
-            for safe in new_safes:
-                self.mark_safe(safe)
-        elif new_mines:
-            for mine in new_mines:
-                self.mark_mine(mine)
-        else:
-            return False
-        return True
+        known = sentence.cells & (self.mine_bits | self.safe_bits)
+        if known:
+            sentence.cells ^= known
+            sentence.size -= count_bits(known)
+            sentence.count -= count_bits(known & self.mine_bits)
 
     def remove_empty_sentence(self):
         """
-        Removes any empty knowledge sentences from the end of knowledge list
+        Removes the empty knowledge sentence, if there is one
         """
-        for i in range(len(self.knowledge)-1, -1, -1):
-            if not self.knowledge[i].cells:
-                if self.knowledge[i].count != 0:
-                    raise KnowledgeCountError
-                self.knowledge.pop(i)
+        sentence = self.knowledge.pop(0, None)
+        if sentence is not None and sentence.count != 0:
+            raise KnowledgeCountError
 
-    def update_mine_safe(self):
+    def update_mine_safe(self, sentence):
         """
-        Updates all knowledge sentences for new known safes and mines
-        and removes any empty knowledge sentences
+        Marks the cells of sentence if they are all known safes or mines
         Returns True if update is made and False otherwise
         """
-        update = False
-        for sentence in self.knowledge:
-            self.remove_known_cells(sentence)
-            if self.add_known_cells(sentence):
-                update = True
+        new_safes = sentence.known_safes()
+        new_mines = sentence.known_mines()
+        for bit in iter_bits(new_safes):
+            self.mark_safe(self.bit_cell(bit))
+        for bit in iter_bits(new_mines):
+            self.mark_mine(self.bit_cell(bit))
+        return bool(new_safes or new_mines)
+
+    def infer_knowledge(self, key, sentence):
+        """
+        Checks sentence stored under key against the knowledge sentences
+        sharing any of its cells and reduces whichever is the superset
+        """
+        candidates = set()
+        for bit in iter_bits(key):
+            candidates |= self.cell_index[bit]
+        candidates.discard(key)
+        for other_key in candidates:
+            other = self.knowledge[other_key]
+            if self.find_set_diff(sentence, other):
+                if sentence.cells != key:
+                    # sentence itself was reduced and is checked again later
+                    self.rekey_sentence(key, sentence)
+                    return
+                self.rekey_sentence(other_key, other)
+
+    def check_sentence(self, key):
+        """
+        Draws any new knowledge from the sentence stored under key
+        """
+        if not key:
+            self.remove_empty_sentence()
+        elif not self.update_mine_safe(self.knowledge[key]):
+            self.infer_knowledge(key, self.knowledge[key])
 
-        self.remove_empty_sentence()
-        return update
-    
-    def infer_knowledge(self):
-        """
-        Checks all pairs of knowledge sentences and modifies
-        the sentence if sentence is subset of another sentence
-        Returns True if update is made and False otherwise
-        """
-        update = False
-        for i in range(len(self.knowledge)):
-            sentence1 = self.knowledge[i]
-            for j in range(i+1, len(self.knowledge)):
-                if self.find_set_diff(sentence1, self.knowledge[j]):
-                    update = True
-        return update
-
-    def knowledge_loop(self):
-        return self.update_mine_safe() or self.infer_knowledge()
-    
     def add_knowledge(self, cell, count):
         """
         Called when the Minesweeper board tells us, for a given
@@ -300,13 +401,20 @@ class MinesweeperAI:
         i, j = cell
         # mark move as move made and safe
         self.moves_made.add((i, j))
+        self.available_safes.discard((i, j))
+        self.available_unknown.discard((i, j))
         self.mark_safe((i, j))
         new_sentence = Sentence(self.neighbors(i, j), count)
-        self.knowledge.append(new_sentence)
+        # older sentences are kept free of known cells by mark_mine/mark_safe
+        self.remove_known_cells(new_sentence)
+        self.add_sentence(new_sentence)
 
-        while self.knowledge_loop():
-            # keep iterating until no new knowledge is gained
-            pass
+        # only sentences added or changed since they were last checked
+        # can lead to new knowledge
+        while self.pending:
+            key = self.pending.popleft()
+            if key in self.knowledge:
+                self.check_sentence(key)
 
     def make_safe_move(self):
         """
@@ -317,10 +425,7 @@ class MinesweeperAI:
         This function may use the knowledge in self.mines, self.safes
         and self.moves_made, but should not modify any of those values.
         """
-        safe_moves = list(self.safes - self.moves_made)
-        if safe_moves:
-            return safe_moves[0]
-        return None
+        return next(iter(self.available_safes), None)
 
     def make_random_move(self):
         """
@@ -329,13 +434,7 @@ class MinesweeperAI:
             1) have not already been chosen, and
             2) are not known to be mines
         """
-        available_moves = []    # list of all available random moves
-        for i in range(self.height):
-            for j in range(self.width):
-                if (i, j) not in self.moves_made and (i, j) not in self.mines:
-                    available_moves.append((i, j))
-
-        if available_moves:
-            return available_moves[random.randrange(len(available_moves))]
+        if self.available_unknown:
+            return random.choice(tuple(self.available_unknown))
         else:
             return None